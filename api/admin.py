@@ -1,14 +1,67 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 from .models import Book, BorrowRecord
 
+class EstimatedCountPaginator(Paginator):
+    """
+    در PostgreSQL برای جدول‌های بزرگ بدون فیلتر، تعداد تخمینی pg_class به جای COUNT(*) استفاده می‌شود
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return row[0]
+        return super().count
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    جستجو فقط با lookupهای ایندکس‌شده: تطابق دقیق و پیشوندی.
+    date_hierarchy استفاده نمی‌شود چون سطح بالای آن روی کل جدول SELECT DISTINCT اجرا می‌کند؛
+    فیلترهای تاریخ list_filter به صورت بازه روی ستون ایندکس‌شده اعمال می‌شوند
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_exact_fields = []
+    search_prefix_fields = []
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q()
+        for field in self.search_exact_fields:
+            query |= Q(**{field: search_term})
+        for field in self.search_prefix_fields:
+            query |= Q(**{f'{field}__startswith': search_term})
+        return queryset.filter(query), False
+
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(LargeTableAdmin):
     list_display = ['title', 'author', 'status', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['title', 'author', 'isbn']
+    search_exact_fields = ['isbn']
+    search_prefix_fields = ['title', 'author']
 
 @admin.register(BorrowRecord)
-class BorrowRecordAdmin(admin.ModelAdmin):
+class BorrowRecordAdmin(LargeTableAdmin):
     list_display = ['book', 'user', 'borrow_date', 'due_date', 'returned']
     list_filter = ['returned', 'borrow_date']
-    search_fields = ['book__title', 'user__username']
\ No newline at end of file
+    list_select_related = ['book', 'user']
+    raw_id_fields = ['book', 'user']
+    search_fields = ['book__title', 'book__isbn', 'user__username']
+    search_exact_fields = ['book__isbn', 'user__username']
+    search_prefix_fields = ['book__title']
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'
\ No newline at end of file
+    name = 'api'
+    
+    def ready(self):
+        from . import checks, signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+NON_SHARED_CACHE_BACKENDS = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+@register(Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    throttle_classes = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_CLASSES', [])
+    if 'api.throttling.RoleTokenBucketThrottle' not in throttle_classes:
+        return []
+    backend = settings.CACHES.get(settings.THROTTLE_CACHE_ALIAS, {}).get('BACKEND')
+    if backend in NON_SHARED_CACHE_BACKENDS:
+        return [
+            Error(
+                f'THROTTLE_CACHE_ALIAS ({settings.THROTTLE_CACHE_ALIAS}) باید به یک کش مشترک بین workerها اشاره کند',
+                hint='از DatabaseCache، Redis یا Memcached استفاده کنید',
+                id='api.E001',
+            )
+        ]
+    return []
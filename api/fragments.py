@@ -0,0 +1,32 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def fragment_key(book, fieldset):
+    return f'book-fragment:{book.pk}:{book.version}:{fieldset}'
+
+
+def fieldset_signature(serializer_class, context):
+    field_names = ','.join(serializer_class(context=context).fields)
+    return hashlib.md5(field_names.encode()).hexdigest()[:12]
+
+
+def render_books(books, serializer_class, context):
+    """
+    ساخت خروجی لیست کتاب‌ها از قطعه‌های کش‌شده؛ فقط کتاب‌های تغییرکرده دوباره سریالایز می‌شوند
+    """
+    fieldset = fieldset_signature(serializer_class, context)
+
+    keyed_books = {fragment_key(book, fieldset): book for book in books}
+    fragments = cache.get_many(keyed_books)
+
+    missing = [book for key, book in keyed_books.items() if key not in fragments]
+    if missing:
+        data = serializer_class(missing, many=True, context=context).data
+        fresh = {fragment_key(book, fieldset): dict(item) for book, item in zip(missing, data)}
+        cache.set_many(fresh, settings.BOOK_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(fresh)
+
+    return [fragments[key] for key in keyed_books]
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+POLL_INTERVAL = 0.1
+
+
+class ClaimLost(Exception):
+    pass
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+
+def idempotent(view_func):
+    """
+    پاسخ درخواست‌های تکراری با هدر Idempotency-Key از پاسخ ذخیره‌شده‌ی اجرای اول داده می‌شود
+    """
+    @wraps(view_func)
+    def wrapped_view(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view_func(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": "طول Idempotency-Key بیش از حد مجاز است"}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyKey.objects.create(user=request.user, key=key, fingerprint=fingerprint)
+                    break
+                except IntegrityError:
+                    continue
+
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {"error": "این Idempotency-Key قبلاً برای درخواست دیگری استفاده شده است"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.completed_at is not None:
+                return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+            if record.created_at < timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                IdempotencyKey.objects.filter(id=record.id, completed_at__isnull=True).delete()
+                continue
+            if time.monotonic() >= deadline:
+                return Response(
+                    {"error": "درخواست اول با این Idempotency-Key هنوز در حال پردازش است"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(POLL_INTERVAL)
+
+        # اجرای view و ذخیره‌ی پاسخ در یک تراکنش؛ اگر کلید در این فاصله توسط درخواست دیگری
+        # پس گرفته شده باشد، تغییرات این اجرا rollback می‌شود
+        try:
+            with transaction.atomic():
+                response = view_func(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    completed = IdempotencyKey.objects.filter(id=record.id, completed_at__isnull=True).update(
+                        status_code=response.status_code,
+                        response_body=response.data,
+                        completed_at=timezone.now()
+                    )
+                    if not completed:
+                        raise ClaimLost
+        except ClaimLost:
+            return Response(
+                {"error": "درخواست دیگری با این Idempotency-Key در حال پردازش است"},
+                status=status.HTTP_409_CONFLICT
+            )
+        except Exception:
+            IdempotencyKey.objects.filter(id=record.id, completed_at__isnull=True).delete()
+            raise
+
+        if response.status_code >= 500:
+            IdempotencyKey.objects.filter(id=record.id, completed_at__isnull=True).delete()
+        return response
+    return wrapped_view
@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import viewsets
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.fragments import fieldset_signature, fragment_key
+from api.models import Book
+from api.serializers import BookSerializer
+from api.views import BookViewSet
+
+
+class UncachedBookViewSet(BookViewSet):
+    list = viewsets.ModelViewSet.list
+
+
+class Command(BaseCommand):
+    help = 'بنچمارک زمان ساخت لیست کتاب‌ها با کش قطعه‌ها (سرد، گرم و پس از تغییر یک کتاب)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        # داده‌های بنچمارک در پایان rollback می‌شوند؛ نسخه‌ی تصادفی از برخورد با کلیدهای قبلی کش جلوگیری می‌کند
+        with transaction.atomic():
+            version = random.randint(10 ** 6, 10 ** 9)
+            Book.objects.bulk_create(
+                [
+                    Book(
+                        title=f'کتاب بنچمارک {i}',
+                        author=f'نویسنده {i % 100}',
+                        isbn=f'8{i:012d}',
+                        description='توضیحات کتاب برای بنچمارک. ' * 5,
+                        version=version,
+                    )
+                    for i in range(rows)
+                ],
+                batch_size=1000,
+            )
+            user = User.objects.create_user(username='__bench_book_cache__')
+            factory = APIRequestFactory()
+
+            def render(viewset):
+                request = factory.get('/api/books/')
+                force_authenticate(request, user=user)
+                started = time.perf_counter()
+                viewset.as_view({'get': 'list'})(request).render()
+                return time.perf_counter() - started
+
+            results = [
+                ('no fragment cache', render(UncachedBookViewSet)),
+                ('cold cache', render(BookViewSet)),
+                ('warm cache', render(BookViewSet)),
+            ]
+
+            book = Book.objects.order_by('?').first()
+            book.status = 'maintenance'
+            book.save(update_fields=['status'])
+            results.append(('warm, one book changed', render(BookViewSet)))
+
+            self.stdout.write(f'{rows} کتاب')
+            for name, elapsed in results:
+                self.stdout.write(f'{name:<26}{elapsed * 1000:>10.1f} ms')
+
+            fieldset = fieldset_signature(BookSerializer, {})
+            keys = [fragment_key(book, fieldset) for book in Book.objects.only('id', 'version')]
+            keys.append(fragment_key(Book(pk=book.pk, version=book.version - 1), fieldset))
+            cache.delete_many(keys)
+            transaction.set_rollback(True)
@@ -0,0 +1,68 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.models import Book
+from api.views import BookViewSet
+
+
+class Command(BaseCommand):
+    help = 'بنچمارک حجم پاسخ و زمان سریالایز لیست کتاب‌ها با fields/omit و gzip'
+
+    variants = [
+        ('full', ''),
+        ('omit=description', '?omit=description'),
+        ('fields=id,title,status', '?fields=id,title,status'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        # داده‌های بنچمارک در پایان rollback می‌شوند
+        with transaction.atomic():
+            self.populate(rows)
+            user = User.objects.create_user(username='__bench_book_list__')
+            view = BookViewSet.as_view({'get': 'list'})
+            factory = APIRequestFactory()
+
+            self.stdout.write(f'{rows} کتاب، بهترین زمان از {repeat} اجرا')
+            self.stdout.write(f'{"variant":<26}{"time (ms)":>12}{"raw bytes":>14}{"gzip bytes":>14}')
+            for name, query in self.variants:
+                best = None
+                for _ in range(repeat):
+                    request = factory.get(f'/api/books/{query}')
+                    force_authenticate(request, user=user)
+                    started = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                raw = len(response.content)
+                compressed = len(compress_string(response.content))
+                self.stdout.write(f'{name:<26}{best * 1000:>12.1f}{raw:>14}{compressed:>14}')
+
+            transaction.set_rollback(True)
+
+    def populate(self, rows):
+        description = 'توضیحات کتاب برای بنچمارک. ' * 20
+        Book.objects.bulk_create(
+            [
+                Book(
+                    title=f'کتاب بنچمارک {i}',
+                    author=f'نویسنده {i % 100}',
+                    isbn=f'9{i:012d}',
+                    description=description,
+                )
+                for i in range(rows)
+            ],
+            batch_size=1000,
+        )
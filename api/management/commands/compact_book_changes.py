@@ -0,0 +1,54 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import BookChange
+
+
+class Command(BaseCommand):
+    help = 'فشرده‌سازی تغییرات قدیمی کتاب‌ها به یک رکورد برای هر کتاب'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        old_changes = BookChange.objects.filter(changed_at__lt=cutoff).order_by('book_id', 'id')
+
+        merged = []
+        obsolete = []
+        with transaction.atomic():
+            for _, group in groupby(old_changes.iterator(chunk_size=batch_size), key=lambda change: change.book_id):
+                group = list(group)
+                if len(group) == 1:
+                    continue
+                latest = group[-1]
+                latest.operation, latest.data = self.merge(group)
+                merged.append(latest)
+                obsolete.extend(change.id for change in group[:-1])
+
+            BookChange.objects.bulk_update(merged, ['operation', 'data'], batch_size=batch_size)
+            for start in range(0, len(obsolete), batch_size):
+                BookChange.objects.filter(id__in=obsolete[start:start + batch_size]).delete()
+
+        self.stdout.write(f'{len(obsolete)} تغییر قدیمی حذف و در {len(merged)} رکورد ادغام شد')
+
+    @staticmethod
+    def merge(changes):
+        """
+        ادغام تغییرات یک کتاب؛ رکورد نهایی حالت آخر کتاب را نگه می‌دارد
+        """
+        if changes[-1].operation == 'deleted':
+            return 'deleted', {}
+        operation = 'created' if changes[0].operation == 'created' else 'updated'
+        data = {}
+        for change in changes:
+            if change.operation == 'deleted':
+                data = {}
+            data.update(change.data)
+        return operation, data
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'حذف Idempotency-Keyهای منقضی‌شده'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=settings.IDEMPOTENCY_KEY_TTL, help='عمر کلیدها به ثانیه')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['ttl'])
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(f'{deleted} کلید منقضی‌شده حذف شد')
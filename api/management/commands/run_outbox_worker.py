@@ -0,0 +1,35 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = 'پردازش رویدادهای outbox امانت و ارسال آن‌ها به handlerها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--max-attempts', type=int, default=8)
+        parser.add_argument('--once', action='store_true', help='پردازش رویدادهای آماده و خروج')
+
+    def handle(self, *args, **options):
+        processed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            try:
+                while True:
+                    count = process_batch(executor, options['batch_size'], options['max_attempts'])
+                    processed += count
+                    if count:
+                        continue
+                    if options['once']:
+                        break
+                    close_old_connections()
+                    time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(f'{processed} رویداد پردازش شد')
@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# در یک پردازه‌ی تازه اجرا می‌شود تا زمان‌ها مانند شروع سرد یک worker باشند
+PROBE = '''
+import json
+import time
+
+phases = []
+started = time.perf_counter()
+
+def mark(name):
+    global started
+    now = time.perf_counter()
+    phases.append([name, now - started])
+    started = now
+
+import django
+mark('import django')
+django.setup()
+mark('django.setup')
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+mark('wsgi handler')
+from importlib import import_module
+from django.conf import settings
+import_module(settings.ROOT_URLCONF)
+mark('urlconf import')
+from api.warmup import warm_up
+phases.extend(warm_up())
+print(json.dumps(phases))
+'''
+
+
+class Command(BaseCommand):
+    help = 'گزارش زمان import و مراحل warm-up در شروع سرد یک worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--imports', type=int, default=0, help='نمایش N ماژول کندتر در import')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'booknama.settings')}
+        command = [sys.executable]
+        if options['imports']:
+            command += ['-X', 'importtime']
+        result = subprocess.run(
+            command + ['-c', PROBE],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr)
+
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        total = sum(elapsed for _, elapsed in phases)
+        self.stdout.write(f'{"phase":<20}{"ms":>10}')
+        for name, elapsed in phases:
+            self.stdout.write(f'{name:<20}{elapsed * 1000:>10.1f}')
+        self.stdout.write(f'{"total":<20}{total * 1000:>10.1f}')
+
+        if options['imports']:
+            self.stdout.write('')
+            self.stdout.write(f'{"module":<50}{"self ms":>10}{"cumulative ms":>16}')
+            for module, self_us, cumulative_us in self.slowest_imports(result.stderr, options['imports']):
+                self.stdout.write(f'{module:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}')
+
+    @staticmethod
+    def slowest_imports(stderr, count):
+        imports = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, module = line[len('import time:'):].split('|')
+            imports.append((module.strip(), int(self_us), int(cumulative_us)))
+        return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
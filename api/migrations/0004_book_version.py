@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
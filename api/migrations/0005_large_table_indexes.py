@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_book_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='author',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='borrowrecord',
+            name='borrow_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['returned', 'borrow_date'], name='api_borrowr_returne_3e59e1_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from datetime import timedelta
 
@@ -10,13 +11,25 @@ class Book(models.Model):
         ('maintenance', 'در تعمیر و نگهداری'),
     ]
     
-    title = models.CharField(max_length=200)
-    author = models.CharField(max_length=100)
+    title = models.CharField(max_length=200, db_index=True)
+    author = models.CharField(max_length=100, db_index=True)
     isbn = models.CharField(max_length=13, unique=True)
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     published_date = models.DateField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # افزایش نسخه در خود UPDATE تا هر نسخه دقیقاً به یک وضعیت ذخیره‌شده تعلق داشته باشد
+        self.version = models.F('version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
     
     def __str__(self):
         return self.title
@@ -24,11 +37,14 @@ class Book(models.Model):
 class BorrowRecord(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='borrow_records')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    borrow_date = models.DateTimeField(auto_now_add=True)
+    borrow_date = models.DateTimeField(auto_now_add=True, db_index=True)
     due_date = models.DateTimeField()
     returned = models.BooleanField(default=False)
     return_date = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [models.Index(fields=['returned', 'borrow_date'])]
+    
     def save(self, *args, **kwargs):
         if not self.due_date:
             self.due_date = timezone.now() + timedelta(days=14)
@@ -50,4 +66,85 @@ class BorrowRecord(models.Model):
             'view_borrow_history': is_librarian or is_admin,
         }
         
-        return permissions_map.get(action, False)
\ No newline at end of file
+        return permissions_map.get(action, False)
+
+class BookChange(models.Model):
+    OPERATION_CHOICES = [
+        ('created', 'ایجاد'),
+        ('updated', 'ویرایش'),
+        ('deleted', 'حذف'),
+    ]
+    TRACKED_FIELDS = ['title', 'author', 'isbn', 'description', 'status', 'published_date']
+    
+    book_id = models.BigIntegerField(db_index=True)
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.book_id} - {self.operation}"
+    
+    @classmethod
+    def snapshot(cls, book, fields=None):
+        fields = [name for name in cls.TRACKED_FIELDS if fields is None or name in fields]
+        return {name: getattr(book, name) for name in fields}
+    
+    @classmethod
+    def record(cls, book, operation, fields=None):
+        data = {} if operation == 'deleted' else cls.snapshot(book, fields)
+        if operation == 'updated' and not data:
+            return None
+        return cls.objects.create(book_id=book.pk, operation=operation, data=data)
+    
+    @classmethod
+    def record_many(cls, books, fields):
+        return cls.objects.bulk_create([
+            cls(book_id=book.pk, operation='updated', data=cls.snapshot(book, fields))
+            for book in books
+        ])
+
+
+class OutboxEvent(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'در انتظار'),
+        ('processing', 'در حال پردازش'),
+        ('done', 'ارسال شده'),
+        ('failed', 'ناموفق'),
+    ]
+    
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['status', 'available_at'])]
+    
+    def __str__(self):
+        return f"{self.event_type} - {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
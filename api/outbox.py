@@ -0,0 +1,127 @@
+import json
+import urllib.request
+from concurrent.futures import as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+
+
+def enqueue(event_type, borrow_records):
+    """
+    ثبت رویدادهای امانت در outbox؛ باید داخل همان تراکنش تغییر امانت صدا زده شود
+    """
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            event_type=event_type,
+            payload={
+                'borrow_record': record.id,
+                'book': record.book_id,
+                'user': record.user_id,
+                'due_date': record.due_date,
+                'return_date': record.return_date,
+            },
+        )
+        for record in borrow_records
+    ])
+
+
+def write_to_file(event):
+    with open(settings.OUTBOX_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({
+            'id': event.id,
+            'event_type': event.event_type,
+            'payload': event.payload,
+        }, ensure_ascii=False) + '\n')
+
+
+def post_to_webhook(event):
+    request = urllib.request.Request(
+        settings.OUTBOX_WEBHOOK_URL,
+        data=json.dumps({
+            'id': event.id,
+            'event_type': event.event_type,
+            'payload': event.payload,
+        }).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    with urllib.request.urlopen(request, timeout=settings.OUTBOX_WEBHOOK_TIMEOUT):
+        pass
+
+
+def get_handlers():
+    return [import_string(path) for path in settings.OUTBOX_HANDLERS]
+
+
+def deliver(event, handlers):
+    for handler in handlers:
+        handler(event)
+
+
+def retry_delay(attempts):
+    delay = settings.OUTBOX_RETRY_BACKOFF * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_BACKOFF_MAX))
+
+
+def claim_batch(batch_size):
+    """
+    رزرو دسته‌ای از رویدادهای آماده؛ رویدادهای processing رهاشده هم دوباره برداشته می‌شوند
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.OUTBOX_LOCK_TIMEOUT)
+    ready = Q(status='pending', available_at__lte=now) | Q(status='processing', locked_at__lt=stale)
+
+    with transaction.atomic():
+        queryset = OutboxEvent.objects.filter(ready).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        OutboxEvent.objects.filter(ready, id__in=ids).update(status='processing', locked_at=now)
+
+    return list(OutboxEvent.objects.filter(id__in=ids, status='processing', locked_at=now))
+
+
+def process_batch(executor, batch_size, max_attempts):
+    """
+    ارسال یک دسته رویداد به handlerها با thread pool و ثبت نتیجه؛ تعداد رویدادهای دسته را برمی‌گرداند
+    """
+    events = claim_batch(batch_size)
+    if not events:
+        return 0
+
+    claimed_at = events[0].locked_at
+    handlers = get_handlers()
+    futures = {executor.submit(deliver, event, handlers): event for event in events}
+    delivered = []
+    for future in as_completed(futures):
+        event = futures[future]
+        error = future.exception()
+        if error is None:
+            delivered.append(event.id)
+            continue
+        attempts = event.attempts + 1
+        if attempts >= max_attempts:
+            outcome = {'status': 'failed'}
+        else:
+            outcome = {'status': 'pending', 'available_at': timezone.now() + retry_delay(attempts)}
+        # فقط اگر رویداد هنوز در اختیار همین claim باشد؛ ممکن است worker دیگری آن را پس گرفته باشد
+        OutboxEvent.objects.filter(id=event.id, status='processing', locked_at=claimed_at).update(
+            attempts=attempts,
+            last_error=repr(error),
+            locked_at=None,
+            **outcome
+        )
+
+    if delivered:
+        OutboxEvent.objects.filter(id__in=delivered, status='processing', locked_at=claimed_at).update(
+            status='done',
+            last_error='',
+            locked_at=None
+        )
+    return len(events)
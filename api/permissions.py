@@ -1,18 +1,23 @@
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
 
+ROLES = ['Admin', 'Librarian', 'Member']
+
+def user_roles(user):
+    """
+    نقش‌های کاربر با یک کوئری روی نام گروه‌ها
+    """
+    if not user or not user.is_authenticated:
+        return set()
+    roles = set(user.groups.filter(name__in=ROLES).values_list('name', flat=True))
+    if user.is_superuser:
+        roles.add('Admin')
+    return roles
+
 def role_required(allowed_roles):
     def decorator(view_func):
         def wrapped_view(self, request, *args, **kwargs):
-            user_roles = set()
-            if request.user.groups.filter(name='Admin').exists() or request.user.is_superuser:
-                user_roles.add('Admin')
-            if request.user.groups.filter(name='Librarian').exists():
-                user_roles.add('Librarian')
-            if request.user.groups.filter(name='Member').exists():
-                user_roles.add('Member')
-            
-            if not user_roles.intersection(set(allowed_roles)):
+            if not user_roles(request.user).intersection(set(allowed_roles)):
                 raise PermissionDenied("شما دسترسی لازم برای این عملیات را ندارید")
             
             return view_func(self, request, *args, **kwargs)
@@ -21,21 +26,16 @@ def role_required(allowed_roles):
 
 class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Admin').exists() or request.user.is_superuser
+        return 'Admin' in user_roles(request.user)
 
 class IsLibrarian(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Librarian').exists()
+        return 'Librarian' in user_roles(request.user)
 
 class IsMember(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Member').exists()
+        return 'Member' in user_roles(request.user)
     
 class IsLibrarianOrAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        user = request.user
-        return (
-            user.groups.filter(name='Librarian').exists()
-            or user.groups.filter(name='Admin').exists()
-            or user.is_superuser
-        )
\ No newline at end of file
+        return bool(user_roles(request.user) & {'Librarian', 'Admin'})
\ No newline at end of file
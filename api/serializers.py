@@ -1,13 +1,73 @@
 from rest_framework import serializers
-from .models import Book, BorrowRecord
+from rest_framework.permissions import SAFE_METHODS
+from .models import Book, BookChange, BorrowRecord
 from django.contrib.auth.models import User
 
-class BookSerializer(serializers.ModelSerializer):
+
+def parse_fieldset(request):
+    """
+    خواندن پارامترهای ?fields= و ?omit= از درخواست؛ فقط برای خواندن اعمال می‌شوند تا اعتبارسنجی نوشتن تغییر نکند
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    fields = params.get('fields')
+    omit = params.get('omit')
+    only = {name.strip() for name in fields.split(',') if name.strip()} if fields else None
+    excluded = {name.strip() for name in omit.split(',') if name.strip()} if omit else set()
+    return only, excluded
+
+
+class SparseFieldsetMixin:
+    """
+    محدود کردن فیلدهای خروجی سریالایزر بر اساس ?fields= و ?omit=
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, excluded = parse_fieldset(self.context.get('request'))
+        if only is not None:
+            fields = {name: field for name, field in fields.items() if name in only}
+        for name in excluded:
+            fields.pop(name, None)
+        return fields
+
+    @classmethod
+    def narrow_queryset(cls, queryset, request, required=()):
+        """
+        محدود کردن ستون‌های کوئری به فیلدهای درخواست‌شده با only()
+        """
+        only, excluded = parse_fieldset(request)
+        if only is None and not excluded:
+            return queryset
+
+        paths = set(required)
+        relations = set()
+        for field in cls(context={'request': request}).fields.values():
+            if field.source == '*':
+                return queryset
+            parts = field.source.split('.')
+            paths.add('__'.join(parts))
+            if len(parts) > 1:
+                relations.add('__'.join(parts[:-1]))
+
+        if not paths:
+            return queryset
+
+        # joinهای قبلی که در فیلدهای درخواست‌شده نیستند با only() تداخل دارند
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+            paths.update(relations)
+        return queryset.only(*paths)
+
+
+class BookSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['id', 'title', 'author', 'isbn', 'description', 'status', 'published_date', 'created_at']
 
-class BorrowRecordSerializer(serializers.ModelSerializer):
+class BorrowRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     book_title = serializers.CharField(source='book.title', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
     
@@ -15,6 +75,14 @@ class BorrowRecordSerializer(serializers.ModelSerializer):
         model = BorrowRecord
         fields = ['id', 'book', 'book_title', 'user', 'user_name', 'borrow_date', 'due_date', 'returned', 'return_date']
 
+class BookChangeSerializer(serializers.ModelSerializer):
+    cursor = serializers.IntegerField(source='id', read_only=True)
+    book = serializers.IntegerField(source='book_id', read_only=True)
+    
+    class Meta:
+        model = BookChange
+        fields = ['cursor', 'book', 'operation', 'data', 'changed_at']
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
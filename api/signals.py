@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Book, BookChange
+
+
+@receiver(post_save, sender=Book)
+def record_book_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        BookChange.record(instance, 'created')
+    else:
+        BookChange.record(instance, 'updated', update_fields)
+
+
+@receiver(post_delete, sender=Book)
+def record_book_delete(sender, instance, **kwargs):
+    BookChange.record(instance, 'deleted')
+
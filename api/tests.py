@@ -1,14 +1,33 @@
-from django.test import TestCase
+import json
+from concurrent.futures import Future
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Book, BorrowRecord
+from .permissions import user_roles
+from .warmup import warm_up
+from .checks import check_throttle_cache
+from .outbox import enqueue, process_batch
+from .throttling import TokenBucket, throttle_cache
+from .models import Book, BookChange, BorrowRecord, IdempotencyKey, OutboxEvent
+from .serializers import BookSerializer
 
 class BookAPITestCase(APITestCase):
     def setUp(self):
         """
         ایجاد داده‌های اولیه برای تست
         """
+        cache.clear()
         self.member_group, _ = Group.objects.get_or_create(name='Member')
         self.librarian_group, _ = Group.objects.get_or_create(name='Librarian') 
         self.admin_group, _ = Group.objects.get_or_create(name='Admin')
@@ -201,3 +220,506 @@ class BookAPITestCase(APITestCase):
             'isbn': '1111111111111'
         })
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+    def test_list_books_with_sparse_fields(self):
+        """
+        تست محدود کردن فیلدهای لیست کتاب‌ها با fields و omit
+        """
+        self.client.force_authenticate(user=self.member_user)
+
+        response = self.client.get('/api/books/?fields=id,title,status')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0].keys()), {'id', 'title', 'status'})
+
+        response = self.client.get('/api/books/?omit=description')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('description', response.data[0])
+        self.assertIn('isbn', response.data[0])
+
+    def test_sparse_fields_do_not_affect_write_validation(self):
+        """
+        تست اینکه fields و omit اعتبارسنجی درخواست‌های نوشتن را تغییر نمی‌دهند
+        """
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.post('/api/books/?fields=id', {'title': 'کتاب ناقص'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('isbn', response.data)
+
+        response = self.client.post('/api/books/?omit=isbn', {
+            'title': 'کتاب کامل',
+            'author': 'نویسنده',
+            'isbn': '5555555555555'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.get(id=response.data['id']).isbn, '5555555555555')
+
+    def test_borrowed_books_with_sparse_fields(self):
+        """
+        تست محدود کردن فیلدهای سوابق امانت با fields
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+
+        response = self.client.get('/api/users/borrowed_books/?fields=book,book_title')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0], {'book': self.book1.id, 'book_title': self.book1.title})
+
+        response = self.client.get('/api/users/borrowed_books/?fields=id')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0].keys()), {'id'})
+
+        response = self.client.get('/api/users/borrowed_books/?omit=book,book_title')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('book', response.data[0])
+        self.assertEqual(response.data[0]['user_name'], self.member_user.username)
+
+    def test_list_books_gzip(self):
+        """
+        تست فشرده‌سازی gzip پاسخ لیست کتاب‌ها
+        """
+        for i in range(20):
+            Book.objects.create(title=f'کتاب {i}', author='نویسنده', isbn=f'99900000000{i:02d}')
+        self.client.force_authenticate(user=self.member_user)
+
+        response = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        response = self.client.get('/api/books/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_batch_borrow_applies_limit_across_batch(self):
+        """
+        تست امانت گروهی و اعمال محدودیت ۳ کتاب روی کل دسته
+        """
+        books = [
+            Book.objects.create(title=f'کتاب گروهی {i}', author='نویسنده', isbn=f'88800000000{i:02d}')
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+
+        book_ids = [book.id for book in books] + [self.book1.id, 999999]
+        response = self.client.post('/api/books/batch_borrow/', {'book_ids': book_ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['borrowed'], 2)
+        self.assertEqual([item['success'] for item in response.data['results']], [True, True, False, False, False])
+        self.assertIn('حداکثر تعداد مجاز', response.data['results'][2]['error'])
+        self.assertEqual(BorrowRecord.objects.filter(user=self.member_user, returned=False).count(), 3)
+
+    def test_batch_borrow_rejects_non_integer_ids(self):
+        """
+        تست رد شناسه‌های غیرعددی مانند true و 1.7 در امانت گروهی
+        """
+        self.client.force_authenticate(user=self.member_user)
+        for book_id in [True, 1.7, 'abc', '²', '-1', 0, 10 ** 30, str(10 ** 30)]:
+            response = self.client.post('/api/books/batch_borrow/', {'book_ids': [book_id]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BorrowRecord.objects.exists())
+
+        response = self.client.post('/api/books/batch_borrow/', {'book_ids': [str(self.book1.id)]}, format='json')
+        self.assertEqual(response.data['borrowed'], 1)
+
+    def test_batch_return(self):
+        """
+        تست بازگرداندن گروهی کتاب‌ها توسط کتابدار
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post('/api/books/batch_borrow/', {'book_ids': [self.book1.id, self.book2.id]}, format='json')
+
+        self.client.force_authenticate(user=self.librarian_user)
+        response = self.client.post('/api/books/batch_return/', {'book_ids': [self.book1.id, self.book2.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['returned'], 2)
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.status, 'available')
+        self.assertFalse(BorrowRecord.objects.filter(returned=False).exists())
+
+        self.client.force_authenticate(user=self.member_user)
+        response = self.client.post('/api/books/batch_return/', {'book_ids': [self.book1.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_borrow_constant_queries(self):
+        """
+        تست ثابت بودن تعداد کوئری‌های امانت گروهی نسبت به اندازه دسته
+        """
+        books = [
+            Book.objects.create(title=f'کتاب گروهی {i}', author='نویسنده', isbn=f'88800000000{i:02d}')
+            for i in range(3)
+        ]
+        other_member = User.objects.create_user(username='member2', password='password123')
+        other_member.groups.add(self.member_group)
+
+        self.client.force_authenticate(user=self.member_user)
+        with CaptureQueriesContext(connection) as single:
+            self.client.post('/api/books/batch_borrow/', {'book_ids': [books[0].id]}, format='json')
+
+        self.client.force_authenticate(user=other_member)
+        with CaptureQueriesContext(connection) as many:
+            self.client.post('/api/books/batch_borrow/', {'book_ids': [books[1].id, books[2].id, self.book1.id]}, format='json')
+
+        self.assertEqual(len(single), len(many))
+
+    def test_book_changes_feed(self):
+        """
+        تست دریافت تغییرات کتاب‌ها از نقطه‌ی مشخص
+        """
+        self.client.force_authenticate(user=self.member_user)
+        response = self.client.get('/api/books/changes/')
+        cursor = response.data['cursor']
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertEqual(response.data['changes'][0]['operation'], 'created')
+
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+        deleted_book_id = self.book2.id
+        self.book2.delete()
+
+        response = self.client.get(f'/api/books/changes/?since={cursor}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['has_more'])
+        changes = response.data['changes']
+        self.assertEqual(
+            [(change['book'], change['operation'], change['data']) for change in changes],
+            [(self.book1.id, 'updated', {'status': 'borrowed'}), (deleted_book_id, 'deleted', {})]
+        )
+        self.assertEqual(response.data['cursor'], changes[-1]['cursor'])
+
+        response = self.client.get(f'/api/books/changes/?since={cursor}&limit=1')
+        self.assertTrue(response.data['has_more'])
+
+        for query in ['since=99999999999999999999999', 'since=abc', 'limit=-1']:
+            response = self.client.get(f'/api/books/changes/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BOOK_CHANGE_FEED_DELAY=5)
+    def test_book_changes_feed_stops_at_unsettled_change(self):
+        """
+        تست اینکه cursor از تغییری که هنوز در بازه‌ی اطمینان است عبور نمی‌کند
+        """
+        BookChange.objects.filter(book_id=self.book1.id).update(changed_at=timezone.now() - timedelta(seconds=2))
+        BookChange.objects.filter(book_id=self.book2.id).update(changed_at=timezone.now() - timedelta(seconds=10))
+        self.client.force_authenticate(user=self.member_user)
+
+        response = self.client.get('/api/books/changes/')
+        self.assertEqual(response.data['changes'], [])
+        self.assertEqual(response.data['cursor'], 0)
+        self.assertFalse(response.data['has_more'])
+
+        BookChange.objects.update(changed_at=timezone.now() - timedelta(seconds=10))
+        response = self.client.get('/api/books/changes/')
+        self.assertEqual([change['book'] for change in response.data['changes']], [self.book1.id, self.book2.id])
+
+    def test_compact_book_changes(self):
+        """
+        تست ادغام تغییرات قدیمی هر کتاب در یک رکورد
+        """
+        self.book1.status = 'maintenance'
+        self.book1.save(update_fields=['status'])
+        BookChange.objects.update(changed_at=timezone.now() - timedelta(days=60))
+
+        call_command('compact_book_changes', days=30, stdout=StringIO())
+
+        changes = BookChange.objects.filter(book_id=self.book1.id)
+        self.assertEqual(changes.count(), 1)
+        self.assertEqual(changes[0].operation, 'created')
+        self.assertEqual(changes[0].data['status'], 'maintenance')
+        self.assertEqual(changes[0].data['isbn'], self.book1.isbn)
+        self.assertEqual(BookChange.objects.filter(book_id=self.book2.id).count(), 1)
+
+    def test_borrow_writes_outbox_event(self):
+        """
+        تست ثبت رویداد outbox هم‌زمان با امانت و بازگرداندن
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+        self.client.force_authenticate(user=self.librarian_user)
+        self.client.post(f'/api/books/{self.book1.id}/return_book/')
+
+        events = OutboxEvent.objects.all()
+        self.assertEqual([event.event_type for event in events], ['book_borrowed', 'book_returned'])
+        self.assertEqual(events[0].payload['book'], self.book1.id)
+        self.assertEqual(events[0].status, 'pending')
+
+    def test_run_outbox_worker(self):
+        """
+        تست پردازش رویدادهای outbox توسط worker
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post('/api/books/batch_borrow/', {'book_ids': [self.book1.id, self.book2.id]}, format='json')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'outbox.log')
+            with self.settings(OUTBOX_FILE=path):
+                call_command('run_outbox_worker', once=True, stdout=StringIO())
+            with open(path, encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual({line['payload']['book'] for line in lines}, {self.book1.id, self.book2.id})
+        self.assertFalse(OutboxEvent.objects.exclude(status='done').exists())
+
+    @override_settings(OUTBOX_HANDLERS=['api.tests.failing_outbox_handler'])
+    def test_run_outbox_worker_retries_with_backoff(self):
+        """
+        تست زمان‌بندی مجدد رویداد پس از خطای handler
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+
+        call_command('run_outbox_worker', once=True, stdout=StringIO())
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.status, 'pending')
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('RuntimeError', event.last_error)
+        self.assertGreater(event.available_at, timezone.now())
+
+    def test_book_save_bumps_version_in_database(self):
+        """
+        تست افزایش نسخه در دیتابیس حتی با نمونه‌ی قدیمی کتاب
+        """
+        stale = Book.objects.get(id=self.book1.id)
+        self.book1.status = 'maintenance'
+        self.book1.save(update_fields=['status'])
+        stale.title = 'عنوان جدید'
+        stale.save()
+
+        self.assertEqual(self.book1.version, 2)
+        self.assertEqual(stale.version, 3)
+        self.assertEqual(Book.objects.get(id=self.book1.id).version, 3)
+
+    def test_list_books_uses_fragment_cache(self):
+        """
+        تست استفاده از قطعه‌های کش‌شده و سریالایز دوباره فقط کتاب تغییرکرده
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.get('/api/books/')
+
+        self.book1.status = 'maintenance'
+        self.book1.save(update_fields=['status'])
+
+        to_representation = BookSerializer.to_representation
+        with patch.object(BookSerializer, 'to_representation', autospec=True, side_effect=to_representation) as mocked:
+            response = self.client.get('/api/books/')
+
+        self.assertEqual(mocked.call_count, 1)
+        statuses = {item['id']: item['status'] for item in response.data}
+        self.assertEqual(statuses, {self.book1.id: 'maintenance', self.book2.id: 'available'})
+
+        response = self.client.get('/api/books/?fields=id,title')
+        self.assertEqual(set(response.data[0].keys()), {'id', 'title'})
+
+    def test_admin_changelist_bounded_queries(self):
+        """
+        تست ثابت بودن تعداد کوئری‌های صفحه‌ی لیست امانت‌ها در ادمین
+        """
+        superuser = User.objects.create_superuser(username='superuser', password='password123')
+        self.client.force_login(superuser)
+
+        def create_borrow_records(count):
+            for i in range(count):
+                user = User.objects.create_user(username=f'reader{BorrowRecord.objects.count()}')
+                book = Book.objects.create(
+                    title=f'کتاب ادمین {user.username}',
+                    author='نویسنده',
+                    isbn=f'77{user.id:011d}'
+                )
+                BorrowRecord.objects.create(book=book, user=user, due_date=timezone.now())
+
+        def changelist_queries(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse([query for query in queries if 'DISTINCT' in query['sql']])
+            return len(queries)
+
+        create_borrow_records(2)
+        few = changelist_queries('/admin/api/borrowrecord/')
+        create_borrow_records(20)
+        many = changelist_queries('/admin/api/borrowrecord/')
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 10)
+        self.assertLessEqual(changelist_queries('/admin/api/book/?q=1234567890123'), 10)
+        self.assertLessEqual(changelist_queries('/admin/api/borrowrecord/?q=reader1'), 10)
+        self.assertLessEqual(changelist_queries('/admin/api/borrowrecord/?borrow_date__gte=2020-01-01'), 10)
+
+    def test_borrow_idempotency_key_replays_response(self):
+        """
+        تست پاسخ تکراری برای درخواست با Idempotency-Key یکسان
+        """
+        self.client.force_authenticate(user=self.member_user)
+        first = self.client.post(f'/api/books/{self.book1.id}/borrow/', HTTP_IDEMPOTENCY_KEY='borrow-1')
+        retry = self.client.post(f'/api/books/{self.book1.id}/borrow/', HTTP_IDEMPOTENCY_KEY='borrow-1')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(BorrowRecord.objects.filter(book=self.book1).count(), 1)
+
+        response = self.client.post(f'/api/books/{self.book2.id}/borrow/', HTTP_IDEMPOTENCY_KEY='borrow-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_idempotency_key_in_flight_conflict(self):
+        """
+        تست پاسخ 409 وقتی اجرای اول هنوز تمام نشده است
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+        self.client.force_authenticate(user=self.librarian_user)
+        path = f'/api/books/{self.book1.id}/return_book/'
+        self.client.post(path, HTTP_IDEMPOTENCY_KEY='return-1')
+        IdempotencyKey.objects.filter(key='return-1').update(completed_at=None)
+
+        response = self.client.post(path, HTTP_IDEMPOTENCY_KEY='return-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_idempotency_key_taken_over_rolls_back(self):
+        """
+        تست rollback امانت وقتی کلید در حین اجرا توسط درخواست دیگری پس گرفته شده است
+        """
+        def take_over_key(*args):
+            IdempotencyKey.objects.all().delete()
+            return enqueue(*args)
+
+        self.client.force_authenticate(user=self.member_user)
+        with patch('api.views.outbox.enqueue', side_effect=take_over_key):
+            response = self.client.post(f'/api/books/{self.book1.id}/borrow/', HTTP_IDEMPOTENCY_KEY='slow')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(BorrowRecord.objects.exists())
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.status, 'available')
+
+    def test_purge_idempotency_keys(self):
+        """
+        تست حذف کلیدهای منقضی‌شده
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/', HTTP_IDEMPOTENCY_KEY='old')
+        self.client.post(f'/api/books/{self.book2.id}/borrow/', HTTP_IDEMPOTENCY_KEY='new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+    @override_settings(ROLE_THROTTLE_RATES={'Member': {'read': '2/min', 'write': '10/min'}})
+    def test_role_throttle_limits_reads_per_user(self):
+        """
+        تست محدودیت نرخ خواندن برای نقش Member با هدر Retry-After
+        """
+        self.client.force_authenticate(user=self.member_user)
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/books/').status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/api/books/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        response = self.client.post(f'/api/books/{self.book1.id}/borrow/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get('/api/users/throttle_stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['Member']['read'], 1)
+
+    def test_token_bucket_requires_lock(self):
+        """
+        تست اینکه به‌روزرسانی token bucket بدون گرفتن قفل انجام نمی‌شود
+        """
+        bucket = TokenBucket('throttle:test', '10/min')
+        throttle_cache().add('throttle:test:lock', 1, 60)
+        with patch('api.throttling.LOCK_WAIT', 0):
+            self.assertFalse(bucket.consume())
+
+        throttle_cache().delete('throttle:test:lock')
+        self.assertTrue(bucket.consume())
+        self.assertIsNone(throttle_cache().get('throttle:test:lock'))
+
+    def test_throttle_cache_check_rejects_local_cache(self):
+        """
+        تست خطای check وقتی کش throttling بین workerها مشترک نیست
+        """
+        self.assertEqual(check_throttle_cache(None), [])
+        with self.settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }):
+            self.assertEqual([error.id for error in check_throttle_cache(None)], ['api.E001'])
+
+    @override_settings(THROTTLE_READ_POOL_RATE='1/min')
+    def test_read_pool_keeps_write_capacity(self):
+        """
+        تست اینکه پر شدن مخزن مشترک خواندن جلوی درخواست‌های نوشتن را نمی‌گیرد
+        """
+        self.client.force_authenticate(user=self.librarian_user)
+        self.assertEqual(self.client.get('/api/books/').status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.member_user)
+        self.assertEqual(self.client.get('/api/books/').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post(f'/api/books/{self.book1.id}/borrow/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_warm_up_phases(self):
+        """
+        تست مراحل warm-up و هشدار نبودن گروه‌های نقش
+        """
+        timings = warm_up()
+        self.assertEqual([name for name, _ in timings], ['routes', 'serializers', 'db connections', 'role groups'])
+
+        self.admin_group.delete()
+        with self.assertLogs('api.warmup', level='WARNING'):
+            warm_up()
+
+    def test_user_roles_follow_renamed_groups(self):
+        """
+        تست اینکه نقش‌ها بدون کش و با نام فعلی گروه‌ها خوانده می‌شوند
+        """
+        Group.objects.filter(name='Member').update(name='OldMember')
+        new_member_group = Group.objects.bulk_create([Group(name='Member')])[0]
+        self.assertEqual(user_roles(self.member_user), set())
+
+        self.member_user.groups.add(new_member_group)
+        with self.assertNumQueries(1):
+            self.assertEqual(user_roles(self.member_user), {'Member'})
+
+    @override_settings(OUTBOX_HANDLERS=['api.tests.reclaiming_outbox_handler'])
+    def test_outbox_completion_respects_newer_claim(self):
+        """
+        تست اینکه worker کند وضعیت رویدادی را که worker دیگری پس گرفته بازنویسی نمی‌کند
+        """
+        self.client.force_authenticate(user=self.member_user)
+        self.client.post(f'/api/books/{self.book1.id}/borrow/')
+
+        process_batch(InlineExecutor(), batch_size=10, max_attempts=3)
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.status, 'processing')
+        self.assertEqual(event.locked_at, RECLAIMED_AT)
+
+
+def failing_outbox_handler(event):
+    raise RuntimeError('handler unavailable')
+
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+RECLAIMED_AT = timezone.now() + timedelta(hours=1)
+
+
+def reclaiming_outbox_handler(event):
+    OutboxEvent.objects.filter(id=event.id).update(locked_at=RECLAIMED_AT)
@@ -0,0 +1,143 @@
+import time
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .permissions import user_roles
+
+ROLE_PRIORITY = ['Admin', 'Librarian', 'Member']
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+LOCK_TIMEOUT = 1
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.005
+
+
+def throttle_cache():
+    return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+@contextmanager
+def cache_lock(key):
+    """
+    قفل کوتاه با cache.add که در backendهای مشترک اتمیک است؛ مقدار True یعنی قفل گرفته شد
+    """
+    cache = throttle_cache()
+    lock_key = f'{key}:lock'
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                yield True
+            finally:
+                cache.delete(lock_key)
+            return
+        time.sleep(LOCK_WAIT)
+    yield False
+
+
+def parse_rate(rate):
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def throttle_role(request):
+    if not request.user or not request.user.is_authenticated:
+        return 'anonymous'
+    roles = user_roles(request.user)
+    return next((role for role in ROLE_PRIORITY if role in roles), 'default')
+
+
+def hit_counter_key(role, scope):
+    return f'throttle-hits:{role}:{scope}'
+
+
+def record_hit(role, scope):
+    cache = throttle_cache()
+    key = hit_counter_key(role, scope)
+    with cache_lock(key) as locked:
+        if locked:
+            cache.set(key, cache.get(key, 0) + 1, None)
+
+
+def throttle_hit_counts():
+    """
+    تعداد درخواست‌های محدودشده به تفکیک نقش و scope
+    """
+    keys = {}
+    for role, rates in settings.ROLE_THROTTLE_RATES.items():
+        for scope in rates:
+            keys[hit_counter_key(role, scope)] = (role, scope)
+    keys[hit_counter_key('all', 'read_pool')] = ('all', 'read_pool')
+
+    counts = {}
+    for key, value in throttle_cache().get_many(keys).items():
+        role, scope = keys[key]
+        counts.setdefault(role, {})[scope] = value
+    return counts
+
+
+class TokenBucket:
+    """
+    token bucket ذخیره‌شده در کش مشترک تا محدودیت بین همه‌ی workerها برقرار باشد؛
+    به‌روزرسانی وضعیت زیر قفل cache_lock انجام می‌شود و اگر قفل گرفته نشود درخواست محدود می‌شود
+    """
+
+    def __init__(self, key, rate):
+        self.key = key
+        self.capacity, self.duration = parse_rate(rate)
+        self.refill_rate = self.capacity / self.duration
+        self.wait = None
+
+    def consume(self):
+        cache = throttle_cache()
+        with cache_lock(self.key) as locked:
+            if not locked:
+                self.wait = LOCK_TIMEOUT
+                return False
+            now = time.time()
+            tokens, updated_at = cache.get(self.key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.wait = (1 - tokens) / self.refill_rate
+            cache.set(self.key, (tokens, now), self.duration)
+            return allowed
+
+
+class RoleTokenBucketThrottle(BaseThrottle):
+    """
+    محدودیت نرخ بر اساس نقش کاربر و endpoint؛ درخواست‌های خواندن علاوه بر سهم هر کاربر
+    از یک مخزن مشترک هم مصرف می‌کنند تا در اوج خواندن ظرفیت نوشتن حفظ شود
+    """
+
+    def allow_request(self, request, view):
+        self.bucket = None
+        role = throttle_role(request)
+        rates = settings.ROLE_THROTTLE_RATES.get(role, {})
+        is_read = request.method in SAFE_METHODS
+        scope = getattr(view, 'action', None)
+        if scope not in rates:
+            scope = 'read' if is_read else 'write'
+        if scope not in rates:
+            return True
+
+        ident = request.user.pk if request.user and request.user.is_authenticated else self.get_ident(request)
+        self.bucket = TokenBucket(f'throttle:{role}:{ident}:{scope}', rates[scope])
+        if not self.bucket.consume():
+            record_hit(role, scope)
+            return False
+
+        if is_read and settings.THROTTLE_READ_POOL_RATE:
+            self.bucket = TokenBucket('throttle:read_pool', settings.THROTTLE_READ_POOL_RATE)
+            if not self.bucket.consume():
+                record_hit('all', 'read_pool')
+                return False
+        return True
+
+    def wait(self):
+        return self.bucket.wait if self.bucket else None
@@ -2,22 +2,63 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import Book, BorrowRecord
-from .serializers import BookSerializer, BorrowRecordSerializer, UserSerializer
+from . import outbox
+from .fragments import render_books
+from .idempotency import idempotent
+from .throttling import throttle_hit_counts
+from .models import Book, BookChange, BorrowRecord
+from .serializers import BookSerializer, BookChangeSerializer, BorrowRecordSerializer, UserSerializer
 from .permissions import IsAdmin, IsLibrarian, IsMember, role_required , IsLibrarianOrAdmin
 
+MAX_ACTIVE_BORROWS = 3
+MAX_BATCH_SIZE = 100
+CHANGE_FEED_DEFAULT_LIMIT = 500
+CHANGE_FEED_MAX_LIMIT = 1000
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id(value, minimum=1):
+    """
+    تبدیل شناسه‌ی عددی (int یا رشته‌ی رقمی) در بازه‌ی BigInteger؛ در غیر این صورت None
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.isdecimal():
+        value = int(value)
+    if not isinstance(value, int) or not minimum <= value <= MAX_ID:
+        return None
+    return value
+
 
 class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = self.get_serializer_class().narrow_queryset(queryset, self.request, required=['version'])
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        context = self.get_serializer_context()
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(render_books(page, self.get_serializer_class(), context))
+        return Response(render_books(queryset, self.get_serializer_class(), context))
+    
     def get_permissions(self):
-        if self.action == 'borrow':
+        if self.action in ['borrow', 'batch_borrow']:
             permission_classes = [IsMember]
-        elif self.action == 'return_book':
+        elif self.action in ['return_book', 'batch_return']:
             permission_classes = [IsLibrarianOrAdmin]
         elif self.action in ['create', 'update', 'destroy']:
             permission_classes = [IsAdmin]
@@ -26,6 +67,7 @@ class BookViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     @action(detail=True, methods=['post'], permission_classes=[IsMember])
+    @idempotent
     def borrow(self, request, pk=None):
         try:
             book = self.get_object()
@@ -40,17 +82,19 @@ class BookViewSet(viewsets.ModelViewSet):
             returned=False
         ).count()
         
-        if active_borrows >= 3:
+        if active_borrows >= MAX_ACTIVE_BORROWS:
             return Response({"error": "شما حداکثر تعداد مجاز کتاب امانت گرفته‌اید"}, status=status.HTTP_400_BAD_REQUEST)
         
-        borrow_record = BorrowRecord.objects.create(
-            book=book,
-            user=request.user,
-            due_date=timezone.now() + timedelta(days=14)
-        )
-        
-        book.status = 'borrowed'
-        book.save()
+        with transaction.atomic():
+            borrow_record = BorrowRecord.objects.create(
+                book=book,
+                user=request.user,
+                due_date=timezone.now() + timedelta(days=14)
+            )
+            
+            book.status = 'borrowed'
+            book.save(update_fields=['status'])
+            outbox.enqueue('book_borrowed', [borrow_record])
         
         serializer = BorrowRecordSerializer(borrow_record)
         return Response({
@@ -59,6 +103,7 @@ class BookViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'], permission_classes=[IsLibrarianOrAdmin])
+    @idempotent
     def return_book(self, request, pk=None):
         try:
             book = self.get_object()
@@ -73,28 +118,168 @@ class BookViewSet(viewsets.ModelViewSet):
         except BorrowRecord.DoesNotExist:
             return Response({"error": "سابقه امانت فعالی برای این کتاب یافت نشد"}, status=status.HTTP_404_NOT_FOUND)
         
-        borrow_record.returned = True
-        borrow_record.return_date = timezone.now()
-        borrow_record.save()
-        
-        book.status = 'available'
-        book.save()
+        with transaction.atomic():
+            borrow_record.returned = True
+            borrow_record.return_date = timezone.now()
+            borrow_record.save()
+            
+            book.status = 'available'
+            book.save(update_fields=['status'])
+            outbox.enqueue('book_returned', [borrow_record])
         
         serializer = BorrowRecordSerializer(borrow_record)
         return Response({
             **serializer.data,
             "message": "کتاب با موفقیت بازگردانده شد"
         })
+    
+    def _get_batch_book_ids(self, request):
+        book_ids = request.data.get('book_ids')
+        if not isinstance(book_ids, list) or not book_ids:
+            return None, "لیست شناسه کتاب‌ها (book_ids) الزامی است"
+        if len(book_ids) > MAX_BATCH_SIZE:
+            return None, f"حداکثر {MAX_BATCH_SIZE} کتاب در هر درخواست مجاز است"
+        book_ids = [parse_id(book_id) for book_id in book_ids]
+        if None in book_ids:
+            return None, "شناسه کتاب‌ها باید عدد صحیح باشد"
+        return list(dict.fromkeys(book_ids)), None
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsMember])
+    @idempotent
+    def batch_borrow(self, request):
+        book_ids, error = self._get_batch_book_ids(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        due_date = timezone.now() + timedelta(days=14)
+        results = []
+        borrow_records = []
+        borrowed_books = []
+        
+        with transaction.atomic():
+            # قفل کاربر تا دسته‌های هم‌زمان یک عضو از محدودیت امانت عبور نکنند
+            User.objects.select_for_update().get(pk=request.user.pk)
+            books = Book.objects.select_for_update().in_bulk(book_ids)
+            remaining = MAX_ACTIVE_BORROWS - BorrowRecord.objects.filter(
+                user=request.user,
+                returned=False
+            ).count()
+            
+            for book_id in book_ids:
+                book = books.get(book_id)
+                if book is None:
+                    results.append({"book": book_id, "success": False, "error": "کتاب یافت نشد"})
+                elif book.status != 'available':
+                    results.append({"book": book_id, "success": False, "error": "این کتاب در حال حاضر موجود نیست"})
+                elif remaining <= 0:
+                    results.append({"book": book_id, "success": False, "error": "شما حداکثر تعداد مجاز کتاب امانت گرفته‌اید"})
+                else:
+                    book.status = 'borrowed'
+                    book.version += 1
+                    borrowed_books.append(book)
+                    borrow_records.append(BorrowRecord(book=book, user=request.user, due_date=due_date))
+                    results.append({"book": book_id, "success": True})
+                    remaining -= 1
+            
+            BorrowRecord.objects.bulk_create(borrow_records)
+            Book.objects.bulk_update(borrowed_books, ['status', 'version'])
+            BookChange.record_many(borrowed_books, ['status'])
+            outbox.enqueue('book_borrowed', borrow_records)
+        
+        return Response({
+            "results": results,
+            "borrowed": len(borrowed_books),
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsLibrarianOrAdmin])
+    @idempotent
+    def batch_return(self, request):
+        book_ids, error = self._get_batch_book_ids(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return_date = timezone.now()
+        results = []
+        returned_records = []
+        returned_books = []
+        
+        with transaction.atomic():
+            books = Book.objects.select_for_update().in_bulk(book_ids)
+            borrow_records = {
+                record.book_id: record
+                for record in BorrowRecord.objects.select_for_update().filter(
+                    book_id__in=book_ids,
+                    returned=False
+                )
+            }
+            
+            for book_id in book_ids:
+                book = books.get(book_id)
+                borrow_record = borrow_records.get(book_id)
+                if book is None:
+                    results.append({"book": book_id, "success": False, "error": "کتاب یافت نشد"})
+                elif borrow_record is None:
+                    results.append({"book": book_id, "success": False, "error": "سابقه امانت فعالی برای این کتاب یافت نشد"})
+                else:
+                    borrow_record.returned = True
+                    borrow_record.return_date = return_date
+                    book.status = 'available'
+                    book.version += 1
+                    returned_records.append(borrow_record)
+                    returned_books.append(book)
+                    results.append({"book": book_id, "success": True})
+            
+            BorrowRecord.objects.bulk_update(returned_records, ['returned', 'return_date'])
+            Book.objects.bulk_update(returned_books, ['status', 'version'])
+            BookChange.record_many(returned_books, ['status'])
+            outbox.enqueue('book_returned', returned_records)
+        
+        return Response({
+            "results": results,
+            "returned": len(returned_books),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        since = parse_id(request.query_params.get('since', '0'), minimum=0)
+        limit = parse_id(request.query_params.get('limit', str(CHANGE_FEED_DEFAULT_LIMIT)))
+        if since is None or limit is None:
+            return Response({"error": "پارامترهای since و limit باید عدد صحیح باشند"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, CHANGE_FEED_MAX_LIMIT)
+        
+        # صفحه در اولین تغییر جدیدتر از بازه‌ی اطمینان قطع می‌شود تا cursor از شناسه‌ای که
+        # ممکن است هنوز commit نشده باشد جلو نزند
+        settled_before = timezone.now() - timedelta(seconds=settings.BOOK_CHANGE_FEED_DELAY)
+        candidates = list(BookChange.objects.filter(id__gt=since).order_by('id')[:limit + 1])
+        changes = []
+        for change in candidates:
+            if change.changed_at > settled_before:
+                break
+            changes.append(change)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        
+        serializer = BookChangeSerializer(changes, many=True)
+        return Response({
+            "cursor": changes[-1].id if changes else since,
+            "has_more": has_more,
+            "changes": serializer.data,
+        })
 
 class UserViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdmin])
+    def throttle_stats(self, request):
+        return Response(throttle_hit_counts())
+    
     @action(detail=False, methods=['get'])
     def borrowed_books(self, request):
         borrowed_books = BorrowRecord.objects.filter(
             user=request.user, 
             returned=False
         ).select_related('book')
+        borrowed_books = BorrowRecordSerializer.narrow_queryset(borrowed_books, request)
         
-        serializer = BorrowRecordSerializer(borrowed_books, many=True)
+        serializer = BorrowRecordSerializer(borrowed_books, many=True, context={'request': request})
         return Response(serializer.data)
\ No newline at end of file
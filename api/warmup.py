@@ -0,0 +1,60 @@
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver, resolve, reverse
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ROUTES = ['book-list', 'book-changes', 'users-borrowed-books']
+
+
+def resolve_routes():
+    get_resolver().url_patterns
+    for name in WARMUP_ROUTES:
+        resolve(reverse(name))
+
+
+def build_serializers():
+    from .serializers import BookChangeSerializer, BookSerializer, BorrowRecordSerializer, UserSerializer
+
+    for serializer_class in [BookSerializer, BorrowRecordSerializer, BookChangeSerializer, UserSerializer]:
+        serializer_class().fields
+
+
+def check_role_groups():
+    from django.contrib.auth.models import Group
+    from .permissions import ROLES
+
+    missing = set(ROLES) - set(Group.objects.filter(name__in=ROLES).values_list('name', flat=True))
+    if missing:
+        logger.warning('role groups missing: %s', ', '.join(sorted(missing)))
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+PHASES = [
+    ('routes', resolve_routes),
+    ('serializers', build_serializers),
+    ('db connections', open_connections),
+    ('role groups', check_role_groups),
+]
+
+
+def warm_up():
+    """
+    آماده‌سازی worker پیش از اولین درخواست؛ زمان هر مرحله را برمی‌گرداند.
+    خطای هر مرحله فقط لاگ می‌شود تا بالا آمدن worker متوقف نشود
+    """
+    timings = []
+    for name, phase in PHASES:
+        started = time.perf_counter()
+        try:
+            phase()
+        except Exception:
+            logger.exception('warm-up phase %s failed', name)
+        timings.append((name, time.perf_counter() - started))
+    return timings
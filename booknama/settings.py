@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,10 +50,41 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.RoleTokenBucketThrottle',
+    ],
+}
+
+# نرخ مجاز درخواست‌ها برای هر نقش؛ کلید می‌تواند read، write یا نام یک action باشد
+ROLE_THROTTLE_RATES = {
+    'Admin': {'read': '600/min', 'write': '300/min'},
+    'Librarian': {'read': '300/min', 'write': '300/min'},
+    'Member': {'read': '120/min', 'write': '30/min', 'changes': '60/min'},
+    'default': {'read': '60/min', 'write': '10/min'},
+    'anonymous': {'read': '30/min', 'write': '10/min'},
 }
+# مخزن مشترک همه‌ی درخواست‌های خواندن؛ درخواست‌های نوشتن از آن مصرف نمی‌کنند
+THROTTLE_READ_POOL_RATE = '3000/min'
+
+# Outbox رویدادهای امانت (python manage.py run_outbox_worker)
+OUTBOX_HANDLERS = [
+    'api.outbox.write_to_file',
+]
+OUTBOX_FILE = BASE_DIR / 'outbox_events.log'
+OUTBOX_WEBHOOK_URL = None
+OUTBOX_WEBHOOK_TIMEOUT = 5
+OUTBOX_RETRY_BACKOFF = 5
+OUTBOX_RETRY_BACKOFF_MAX = 900
+OUTBOX_LOCK_TIMEOUT = 300
+
+# Idempotency-Key برای POSTهای امانت و بازگرداندن (python manage.py purge_idempotency_keys)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,9 +120,49 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# شناسه‌ی BookChange هنگام insert گرفته می‌شود ولی هنگام commit دیده می‌شود؛ فید تغییرات فقط
+# رکوردهای قدیمی‌تر از این چند ثانیه را برمی‌گرداند تا cursor از تراکنش‌های commit‌نشده جلو نزند.
+# باید از طولانی‌ترین تراکنش نوشتن بیشتر باشد. SQLite در هر لحظه یک نویسنده دارد و به تأخیر نیاز ندارد
+BOOK_CHANGE_FEED_DELAY = 0 if DATABASES['default']['ENGINE'].endswith('sqlite3') else 5
+
+# آماده‌سازی worker هنگام بارگذاری booknama.wsgi (python manage.py startup_profile)
+WARMUP_ON_STARTUP = os.environ.get('BOOKNAMA_WARMUP') == '1'
+
+
+# Cache
+# default: کش محلی هر پردازه برای قطعه‌های سریالایزشده (کلیدها نسخه‌دار هستند و اشتراک لازم نیست)
+# shared: کش مشترک بین workerها برای throttling؛ پیش‌فرض جدول دیتابیس است
+# (python manage.py createcachetable) و با BOOKNAMA_REDIS_URL از Redis استفاده می‌شود
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'booknama_cache',
+    },
+}
+
+if os.environ.get('BOOKNAMA_REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['BOOKNAMA_REDIS_URL'],
+    }
+
+THROTTLE_CACHE_ALIAS = 'shared'
+
+# قطعه‌های سریالایزشده کتاب‌ها با کلید (id, version) کش می‌شوند
+BOOK_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booknama.settings')
 
 application = get_wsgi_application()
+
+# warm-up در هر worker اجرا می‌شود؛ با gunicorn --preload اتصال‌های دیتابیس بین workerها مشترک می‌شوند،
+# پس همراه با preload از آن استفاده نکنید
+if settings.WARMUP_ON_STARTUP:
+    from api.warmup import warm_up
+
+    warm_up()
\ No newline at end of file
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APIClient
@@ -8,6 +9,7 @@ from api.models import Book, BorrowRecord
 class JudgeBookTestCase(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.member_group, _ = Group.objects.get_or_create(name='Member')
         self.librarian_group, _ = Group.objects.get_or_create(name='Librarian')
         self.admin_group, _ = Group.objects.get_or_create(name='Admin')